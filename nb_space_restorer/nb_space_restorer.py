@@ -2,16 +2,17 @@
 
 Defines the NBSpaceRestorer class"""
 
-import operator
+import os
 import time
+import warnings
 from collections import Counter
-from functools import lru_cache, reduce
+from concurrent.futures import ProcessPoolExecutor
 from math import log10
 from typing import List, Optional, Tuple, Union
 
-from nltk.util import everygrams
+from numba import njit, types
+from numba.typed import Dict
 import pandas as pd
-import psutil
 from fre import FeatureRestorationEvaluator
 from sklearn.model_selection import ParameterGrid
 from scipy.stats import norm
@@ -22,16 +23,21 @@ from nb_space_restorer.nb_helper import (display_or_print, get_tqdm,
                                          try_clear_output)
 
 tqdm_ = get_tqdm()
+_worker_restorer = None
 
-MAX_CACHE_SIZE = 1_000_000
 L_DEFAULT = 20
 LAMBDA_DEFAULT = 10.0
 METRIC_TO_OPTIMIZE_DEFAULT = 'F-score'
 MIN_OR_MAX_DEFAULT = 'max'
+# Log probability of any word beginning with a mei letter
+LOG_P_MEI = -100.0
 
 ERROR_MIN_OR_MAX = """\
 min_or_max should be one of either "min" or "max"
 """
+ERROR_TOO_MANY_IDS = """\
+The vocabulary is too large to key {max_n_gram}-grams by a 64-bit integer. \
+Try a smaller value of max_n_gram."""
 
 MESSAGE_FINISHED_LOADING = "Finished loading model."
 MESSAGE_GRID_SEARCH_INCOMPLETE = """\
@@ -63,6 +69,228 @@ MESSAGE_TESTED_SO_FAR = """\
 {completed}/{total} parameter combinations tested so far."""
 MESSAGE_TRAINING_COMPLETE = "Training complete."
 
+WARNING_SHOW_CHUNKS = """\
+show_chunks is deprecated and has no effect, as documents are no longer \
+split into chunks."""
+
+
+# ====================
+@njit(cache=True)
+def _typed_log_freqs(keys: np.ndarray, values: np.ndarray) -> Dict:
+    """Build a numba typed dictionary from arrays of keys and values"""
+
+    log_freqs = Dict.empty(key_type=types.int64, value_type=types.float64)
+    for k in range(len(keys)):
+        log_freqs[keys[k]] = values[k]
+    return log_freqs
+
+
+# ====================
+@njit(cache=True)
+def _log_cPw(prev: np.ndarray,
+             word_id: int,
+             log_Pw: np.ndarray,
+             log_freqs: Dict,
+             id_bits: int) -> float:
+    """Get the conditional log probability of a known word given the
+    previous words, backing off to shorter contexts if the N-gram was not seen
+    in training.
+
+    Args:
+      prev (np.ndarray):
+        The IDs of the previous words (0 for unknown words or the start of
+        the document)
+      word_id (int):
+        The ID of the candidate word
+      log_Pw (np.ndarray):
+        Unigram log probabilities indexed by word ID
+      log_freqs (Dict):
+        Log N-gram frequencies keyed by packed word IDs
+      id_bits (int):
+        The number of bits used for each word ID in packed keys
+
+    Returns:
+      float:
+        The Naive Bayes log probability
+    """
+
+    for start in range(len(prev)):
+        context_key = 0
+        for t in range(start, len(prev)):
+            if prev[t] == 0:
+                context_key = -1
+                break
+            context_key = (context_key << id_bits) | prev[t]
+        if context_key == -1:
+            continue
+        key = (context_key << id_bits) | word_id
+        if key in log_freqs:
+            return log_freqs[key] - log_freqs[context_key]
+    return log_Pw[word_id]
+
+
+# ====================
+@njit(cache=True)
+def _trie_child(node: int,
+                char: int,
+                child_ptr: np.ndarray,
+                child_chars: np.ndarray,
+                child_nodes: np.ndarray) -> int:
+    """Get the child of a trie node for a character, or -1 if there is no
+    such child"""
+
+    # Children of each node are sorted by character, so binary search them
+    lo = child_ptr[node]
+    hi = child_ptr[node + 1]
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if child_chars[mid] < char:
+            lo = mid + 1
+        else:
+            hi = mid
+    if lo < child_ptr[node + 1] and child_chars[lo] == char:
+        return child_nodes[lo]
+    return -1
+
+
+# ====================
+@njit(cache=True)
+def _nb_segment(chars: np.ndarray,
+                is_uyir: np.ndarray,
+                is_mei: np.ndarray,
+                child_ptr: np.ndarray,
+                child_chars: np.ndarray,
+                child_nodes: np.ndarray,
+                node_word_ids: np.ndarray,
+                log_Pw: np.ndarray,
+                log_freqs: Dict,
+                log_unk_lens: np.ndarray,
+                n_prev: int,
+                id_bits: int) -> np.ndarray:
+    """Find the most likely segmentation of a document.
+
+    Args:
+      chars (np.ndarray):
+        The code points of the characters in the document
+      is_uyir (np.ndarray):
+        Whether the character at each position is an uyir letter
+      is_mei (np.ndarray):
+        Whether the character at each position is a mei letter
+      child_ptr (np.ndarray):
+        The children of trie node n are at indices
+        child_ptr[n]:child_ptr[n + 1] of child_chars and child_nodes
+      child_chars (np.ndarray):
+        The code point leading to each child node, in increasing order for
+        each node
+      child_nodes (np.ndarray):
+        The index of each child node
+      node_word_ids (np.ndarray):
+        The ID of the word completed at each trie node, or 0 if none
+      log_Pw (np.ndarray):
+        Unigram log probabilities indexed by word ID
+      log_freqs (Dict):
+        Log N-gram frequencies keyed by packed word IDs
+      log_unk_lens (np.ndarray):
+        Log probabilities of unknown words indexed by length, for lengths
+        up to the maximum word length L
+      n_prev (int):
+        The number of previous words to use as context
+      id_bits (int):
+        The number of bits used for each word ID in packed keys
+
+    Returns:
+      np.ndarray:
+        The positions at which the words of the best segmentation start,
+        followed by the length of the document
+    """
+
+    N = len(chars)
+    L = len(log_unk_lens) - 1
+    # The ID of the word text[j:j + k], or 0 if it is not in the
+    # vocabulary. max_len[j] is the length of the longest word that can
+    # start at j, since uyir letters can only appear at the beginning of
+    # words.
+    span_ids = np.zeros((N, L + 1), dtype=np.int64)
+    max_len = np.zeros(N, dtype=np.int64)
+    for j in range(N):
+        node = 0
+        for k in range(1, min(N - j, L) + 1):
+            if k > 1 and is_uyir[j + k - 1]:
+                break
+            if node >= 0:
+                node = _trie_child(
+                    node, chars[j + k - 1], child_ptr, child_chars,
+                    child_nodes)
+            if node >= 0:
+                span_ids[j, k] = node_word_ids[node]
+            max_len[j] = k
+    # A DP state is the lengths of the last n_prev words (at least one, so
+    # that the best segmentation can be traced back), with 0 for words
+    # before the start of the document. The most recent word is the most
+    # significant digit in base L + 1.
+    n_digits = max(n_prev, 1)
+    base = L + 1
+    top = base ** (n_digits - 1)
+    n_states = base ** n_digits
+    scores = np.full((N + 1, n_states), -np.inf)
+    scores[0, 0] = 0.0
+    back = np.zeros((N + 1, n_states), dtype=np.int64)
+    prev = np.zeros(n_prev, dtype=np.int64)
+    for j in range(N):
+        for state in range(n_states):
+            prev_score = scores[j, state]
+            if prev_score == -np.inf:
+                continue
+            # Get the IDs of the previous words from their lengths
+            end = j
+            rest = state
+            for t in range(n_prev - 1, -1, -1):
+                k = rest // top
+                rest = (rest % top) * base
+                if k == 0:
+                    prev[:t + 1] = 0
+                    break
+                prev[t] = span_ids[end - k, k]
+                end -= k
+            for k in range(1, max_len[j] + 1):
+                word_id = span_ids[j, k]
+                if is_mei[j]:
+                    score = prev_score + LOG_P_MEI
+                elif word_id == 0:
+                    score = prev_score + log_unk_lens[k]
+                else:
+                    score = prev_score + _log_cPw(
+                        prev, word_id, log_Pw, log_freqs, id_bits)
+                next_state = state // base + k * top
+                if score > scores[j + k, next_state]:
+                    scores[j + k, next_state] = score
+                    back[j + k, next_state] = state
+    # Trace the best segmentation back from the end of the document
+    state = np.argmax(scores[N])
+    starts = [N]
+    i = N
+    while i > 0:
+        state_i = state
+        state = back[i, state_i]
+        i -= state_i // top
+        starts.append(i)
+    return np.array(starts[::-1], dtype=np.int64)
+
+
+# ====================
+def _init_worker(restorer: 'NBSpaceRestorer'):
+    """Store the model in a worker process so that it is only sent to each
+    worker once"""
+
+    global _worker_restorer
+    _worker_restorer = restorer
+
+
+# ====================
+def _restore_doc_in_worker(text: str) -> str:
+
+    return _worker_restorer.restore_doc(text)
+
 
 # ====================
 class NBSpaceRestorer:
@@ -105,37 +333,43 @@ class NBSpaceRestorer:
         self.metric_to_optimize = METRIC_TO_OPTIMIZE_DEFAULT
         self.min_or_max = MIN_OR_MAX_DEFAULT
         self.running_grid_search = False
-        self.freqs: Counter = Counter()
+        freqs: Counter = Counter()
         self.ngram_freqs: Counter = Counter()
         self.max_n_gram: int = max_n_gram
 
         self.uyir_letters = uyir_letters.copy()
         self.mei_letters = mei_letters.copy()
 
-        self.distribution = {}
         self.distribution_fn = None
         self.likely_len = 0
-        word_lengths = []
-
+        word_lengths: Counter = Counter()
+
+        if ignore_case:
+            train_texts = map(str.lower, train_texts)
+        # Bind methods and attributes used for every text to local names
+        update_freqs = freqs.update
+        update_word_lengths = word_lengths.update
+        ngram_freqs = self.ngram_freqs
+        orders = range(1, max_n_gram + 1)
         for text in train_texts:
-            if ignore_case:
-                text = text.lower()
             words = text.split()
-            for word in words:
-                word_lengths.append(len(word))
-
-            grams = list(everygrams(words, max_len=max_n_gram))
-            self.freqs.update(grams)
-            self.ngram_freqs.update([len(gram) for gram in grams])
-
-        self.distribution_fn = norm(np.mean(word_lengths), np.std(word_lengths))
-        self.likely_len = np.mean(word_lengths)
-        for length in range(1, 20):
-            self.distribution[length] = self.distribution_fn.pdf(length)
+            update_word_lengths(map(len, words))
+            for n in orders:
+                update_freqs(zip(*(words[k:] for k in range(n))))
+                ngram_freqs[n] += max(0, len(words) - n + 1)
+
+        lengths = np.array(list(word_lengths.keys()))
+        length_counts = np.array(list(word_lengths.values()))
+        mean_len = np.average(lengths, weights=length_counts)
+        std_len = np.sqrt(np.average((lengths - mean_len) ** 2,
+                                     weights=length_counts))
+        self.distribution_fn = norm(mean_len, std_len)
+        self.likely_len = mean_len
 
         self.unknown_function = unknown_function
 
         self.grid_searches = {}
+        self.get_ngram_arrays(freqs)
         self.get_pdists()
         print(MESSAGE_TRAINING_COMPLETE)
         self.save()
@@ -147,9 +381,26 @@ class NBSpaceRestorer:
         """
 
         if self.save_path is not None:
-            save_pickle(self.__dict__, self.save_path)
+            save_pickle(self.__getstate__(), self.save_path)
             print(MESSAGE_SAVED.format(self.save_path))
 
+    # ====================
+    def __getstate__(self) -> dict:
+        """Get the model attributes to save or send to worker processes.
+
+        Attributes beginning with an underscore are derived from the other
+        attributes by get_pdists and are left out.
+        """
+
+        return {k: v for k, v in self.__dict__.items()
+                if not k.startswith('_')}
+
+    # ====================
+    def __setstate__(self, state: dict):
+
+        self.__dict__ = state
+        self.get_pdists()
+
     # ====================
     @classmethod
     def load(cls,
@@ -172,6 +423,13 @@ class NBSpaceRestorer:
 
         self = cls.__new__(cls)
         self.__dict__ = load_pickle(load_path)
+        if 'freqs' in self.__dict__:
+            # Model saved with N-gram frequencies as a Counter
+            self.get_ngram_arrays(self.__dict__.pop('freqs'))
+            self.__dict__.pop('PNdist', None)
+        # Unused table of word length probabilities saved by older models
+        self.__dict__.pop('distribution', None)
+        self.get_pdists()
         if read_only is True:
             self.save_path = None
         else:
@@ -182,175 +440,150 @@ class NBSpaceRestorer:
         return self
 
     # ====================
-    def get_pdists(self):
-        """Get N-gram probability distributions from N-gram
-        frequencies"""
+    def get_ngram_arrays(self, freqs: Counter):
+        """Store N-gram frequencies as arrays of word IDs and counts, which
+        are much faster to save and load than a Counter of tuples.
 
-        self.PNdist = {gram: freq / self.ngram_freqs[len(gram)]
-                       for gram, freq in self.freqs.items()}
-
-    # ====================
-    def splits(self, text: str) -> List[tuple]:
-        """Split text into a list of candidate (word, remainder) pairs.
-
-        Args:
-          text (str):
-            An unspaced input text
-
-        Returns:
-          List[tuple]:
-            A list of candidate (word, remainder) pairs
-        """
-        stop_index = self.L
-        for index, character in enumerate(text[1:self.L]):
-            if character in self.uyir_letters:
-                stop_index = index + 1
-                break
-
-        return [
-            (text[:i + 1], text[i + 1:]) for i in range(min(len(text), stop_index))
-        ]
-
-    # ====================
-    @staticmethod
-    def product(lis_: List[float]) -> float:
-        """Product of a list of numbers
+        Each word in the vocabulary is assigned an integer ID starting from
+        1 (0 is reserved for unknown words and the start of the document).
+        The vocabulary is stored as a single space-separated string, with
+        the word with ID i at position i - 1.
 
         Args:
-          lis_ (List[float]):
-            A list of floats
-
-        Returns:
-          float:
-            The product of the floats in the input list
+          freqs (Counter):
+            The frequencies of all N-grams up to self.max_n_gram, keyed by
+            tuples of words
         """
 
-        return reduce(operator.mul, lis_, 1)
+        vocab = [gram[0] for gram in freqs if len(gram) == 1]
+        self.vocab = ' '.join(vocab)
+        word_ids = {word: id_ for id_, word in enumerate(vocab, start=1)}
+        ids = {n: [] for n in range(1, self.max_n_gram + 1)}
+        counts = {n: [] for n in range(1, self.max_n_gram + 1)}
+        get_id = word_ids.__getitem__
+        for gram, freq in freqs.items():
+            ids[len(gram)].extend(map(get_id, gram))
+            counts[len(gram)].append(freq)
+        self.ngram_ids = [np.array(ids[n], dtype=np.int32).reshape(-1, n)
+                          for n in ids]
+        self.ngram_counts = [np.array(counts[n], dtype=np.int64)
+                             for n in counts]
 
     # ====================
-    def Pwords(self, words: List[str]) -> float:
-        """Get Naive Bayes probability of a sequence of words.
-
-        Args:
-          words (List[str]):
-            A list of words
-
-        Returns:
-          float:
-            The NB probability
-        """
-
-        return self.product([self.Pw(w) for w in words])
+    def get_pdists(self):
+        """Get log N-gram frequencies from N-gram frequencies, so that
+        probabilities can be computed by subtraction at inference time.
+
+        N-grams are keyed by their word IDs packed into a single
+        integer."""
+
+        vocab = self.vocab.split(' ')
+        self._word_ids = {word: id_ for id_, word in enumerate(vocab, start=1)}
+        self._id_bits = (len(vocab) + 1).bit_length()
+        if self._id_bits * self.max_n_gram > 63:
+            raise ValueError(ERROR_TOO_MANY_IDS.format(
+                max_n_gram=self.max_n_gram))
+        log_counts = [np.log10(counts) for counts in self.ngram_counts]
+        self._log_freqs = _typed_log_freqs(
+            np.concatenate([self.pack_ids(ids) for ids in self.ngram_ids]),
+            np.concatenate(log_counts)
+        )
+        self._log_N1 = log10(self.ngram_freqs[1])
+        self._log_Pw = np.full(len(vocab) + 1, -np.inf)
+        self._log_Pw[self.ngram_ids[0][:, 0]] = log_counts[0] - self._log_N1
+        self.get_log_unk()
+        self.get_trie()
+        self._uyir_code_points = self.code_points(self.uyir_letters)
+        self._mei_code_points = self.code_points(self.mei_letters)
 
     # ====================
-    def Pw(self, word: str) -> float:
-        """Get Naive Bayes probability of a single word
+    def pack_ids(self, ids: np.ndarray) -> np.ndarray:
+        """Pack each row of an array of word IDs into a single integer key.
 
         Args:
-          word (str):
-            A single candidate word
+          ids (np.ndarray):
+            An array of shape (number of N-grams, N) containing word IDs,
+            none of which are 0
 
         Returns:
-          float:
-            The NB probability
+          np.ndarray:
+            The key for each N-gram in self._log_freqs
         """
 
-        if (word,) in self.PNdist:
-            return self.PNdist[(word,)]
-        else:
-            # For unknown words, assign lower probabilities for longer words
-            if self.unknown_function == 'gaussian':
-                return self.lambda_ / self.ngram_freqs[1] *\
-                                    (self.distribution[len(word)] if len(word)
-                                    in self.distribution else self.distribution_fn(len(word)))
-            else:
-                return self.lambda_ / (self.ngram_freqs[1] * 10 ** (abs(len(word) - self.likely_len)))
+        keys = np.zeros(len(ids), dtype=np.int64)
+        for column in ids.T:
+            keys = (keys << self._id_bits) | column
+        return keys
 
     # ====================
-    # def cPw(self, word: str, prev: str) -> float:
-    def cPw(self, words: tuple[str]) -> float:
-        """Get the conditional probability of a word given the previous word.
-
-        Args:
-          words (tuple[str]):
-            The candidate word preceded by its previous words
-
-        Returns:
-            float: The Naive Bayes probability
+    def get_trie(self):
+        """Build a character trie over the unigram vocabulary, stored as
+        flat arrays for use in compiled code.
+
+        Node 0 is the root. The children of node n are at indices
+        child_ptr[n]:child_ptr[n + 1] of _trie_child_chars (the code point
+        leading to each child, in increasing order) and _trie_child_nodes.
+        _trie_word_ids[n] is the ID of the word completed at node n, or 0.
         """
-        if words[-1][0] in self.mei_letters:
-            return 1e-100
-
-        if len(words) == 1:
-            return self.Pw(words[0])
 
-        if words in self.freqs and words[:-1] in self.freqs:
-            return self.freqs[words] / self.freqs[words[:-1]]
-        else:
-            return self.cPw(words[1:])
-
-        # try:
-        #     return self.PNdist[words] / self.PNdist[words[:-1]]
-        # except KeyError:
-        #     return self.lambda_ * self.cPw(words[1:])
-        #     # return self.cPw(words[1:])
+        trie = {}
+        for word, id_ in self._word_ids.items():
+            node = trie
+            for char in word:
+                node = node.setdefault(char, {})
+            node[None] = id_
+        # Number the nodes breadth first so that the children of each node
+        # are contiguous
+        nodes = [trie]
+        child_ptr = [0]
+        child_chars = []
+        child_nodes = []
+        word_ids = []
+        for node in nodes:
+            word_ids.append(node.pop(None, 0))
+            for char in sorted(node):
+                child_chars.append(ord(char))
+                child_nodes.append(len(nodes))
+                nodes.append(node[char])
+            child_ptr.append(len(child_chars))
+        self._trie_child_ptr = np.array(child_ptr, dtype=np.int64)
+        self._trie_child_chars = np.array(child_chars, dtype=np.uint32)
+        self._trie_child_nodes = np.array(child_nodes, dtype=np.int64)
+        self._trie_word_ids = np.array(word_ids, dtype=np.int64)
 
     # ====================
-    def combine(self,
-                Pfirst: float,
-                first: str,
-                rem_: Tuple[float, list]) -> Tuple[float, list]:
-        """Combine the probability of a word, the word, and list of remaining
-        words together with their probability to return the combined
-        probability and combined list of words.
+    @staticmethod
+    def code_points(letters: List[str]) -> np.ndarray:
+        """Get the code points of a list of single-character letters
 
         Args:
-          Pfirst (float):
-            Probability of the first word
-          first (str):
-            The first word
-          rem_ (Tuple[float, list]):
-            The probability of the remaining words, and the list of words
+          letters (List[str]):
+            A list of letters. Letters longer than one character can never
+            match a single character of input text and are ignored.
 
         Returns:
-          Tuple[float, list]:
-            The combined probability and combined list of words
+          np.ndarray:
+            The code points of the letters
         """
 
-        Prem, rem = rem_
-        return Pfirst + Prem, [first] + rem
+        return np.array([ord(letter) for letter in letters
+                         if len(letter) == 1], dtype=np.uint32)
 
     # ====================
-    @lru_cache(maxsize=MAX_CACHE_SIZE)
-    def restore_chunk(self, text_: str, prev: tuple[str] = None) -> Tuple[float, list]:
-        """Restore spaces to a short string of input characters
-
-        Will result in RecursionError if length of text_ is more than
-        around 100.
-
-        Args:
-          text_ (str):
-            The text to restore spaces to.
-          prev (tuple[str], optional):
-            The previous words. Defaults to ('<S>',) repeated max_n_gram times.
-
-        Returns:
-          Tuple[float, list]:
-            The probability of the most likely split, and the list of
-            words
-        """
-
-        if prev is None:
-            prev = ('<S>',) * self.max_n_gram
-
-        if not text_:
-            return 0.0, []
-
-        candidates = [self.combine(log10(self.cPw(prev[1:] + (first,))),
-                                   first,
-                                   self.restore_chunk(rem, prev[1:] + (first,)))
-                      for first, rem in self.splits(text_)]
-        return max(candidates)
+    def get_log_unk(self):
+        """Get the Naive Bayes log probability of an unknown word of each
+        length up to L, indexed by length"""
+
+        self._log_unk_params = (self.L, self.lambda_, self.unknown_function)
+        self._log_unk = log10(self.lambda_) - self._log_N1
+        lengths = np.arange(self.L + 1)
+        # For unknown words, assign lower probabilities for longer words
+        if self.unknown_function == 'gaussian':
+            self._log_unk_lens = self._log_unk + np.log10(
+                self.distribution_fn.pdf(lengths))
+        else:
+            self._log_unk_lens = self._log_unk - np.abs(
+                lengths - self.likely_len)
 
     # ====================
     def restore_doc(self,
@@ -359,55 +592,55 @@ class NBSpaceRestorer:
         """Restore spaces to a string of input characters of arbitrary
         length.
 
-        For strings over around 100 characters in length, break them
-        into chunks for segmentation and then put the words back together
-        to avoid recursion limit errors.
+        The characters of the text are converted to an array of code
+        points once, and the most likely segmentation is found in a single
+        left-to-right pass over the input by the compiled function
+        _nb_segment, which walks the vocabulary trie from each position to
+        find candidate words. Only words in the vocabulary are looked up in
+        the N-gram tables and all other candidates are scored by length.
+        The best score is kept for each position and each combination of
+        lengths of the previous max_n_gram - 1 words, so the segmentation
+        found is the most likely one under the model.
 
         Args:
           text (str):
             The text to restore spaces to
           show_chunks (bool, optional):
-            Whether to print out information about each chunk.
-            Defaults to False.
+            Deprecated and ignored, as documents are no longer split into
+            chunks. Defaults to False.
 
         Returns:
           str:
             The document with spaces restored
         """
 
-        chunk_len_chars = 80  # Low enough to avoid recursion errors
-        all_words = []
-        prefix = ''
-        chunk_counter = 1
-        # Iterate over chunks of the input string
-        for offset in range(0, len(text), chunk_len_chars):
-            # Prefix with the last five 'words' from the previous segmentation
-            text_to_segment = prefix + text[offset:offset + chunk_len_chars]
-            chunk_segmented = self.restore_chunk(text_to_segment)[1].copy()
-            # Words may have been cut off at the end, so put the last five
-            # words back into the segmenter next time round and discard them
-            # this time
-            prefix = ''.join(chunk_segmented[-5:])
-            all_words.extend(chunk_segmented[:-5])
-            if show_chunks:
-                print(f'Chunk {chunk_counter}')
-                print(f'Text segmented: {text_to_segment}')
-                print(f'Result of segmentation: {chunk_segmented}')
-                print(f'Words added to list this time: {chunk_segmented[:-5]}')
-                print(f'Prefix for next chunk: {prefix}')
-                print(f'Words added to list so far: {all_words}')
-                print('-' * 100)
-                chunk_counter += 1
-        # Add any text remaining in 'prefix'
-        all_words.extend(self.restore_chunk(prefix)[1])
-        joined = ' '.join(all_words).strip()
-        return joined
+        if show_chunks:
+            warnings.warn(WARNING_SHOW_CHUNKS, DeprecationWarning,
+                          stacklevel=2)
+        # L, lambda_ or unknown_function may have been assigned directly
+        if self._log_unk_params != (self.L, self.lambda_,
+                                    self.unknown_function):
+            self.get_log_unk()
+        chars = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+        starts = _nb_segment(
+            chars,
+            np.isin(chars, self._uyir_code_points),
+            np.isin(chars, self._mei_code_points),
+            self._trie_child_ptr, self._trie_child_chars,
+            self._trie_child_nodes, self._trie_word_ids,
+            self._log_Pw, self._log_freqs,
+            self._log_unk_lens,
+            self.max_n_gram - 1, self._id_bits
+        )
+        return ' '.join(
+            text[i:j] for i, j in zip(starts[:-1], starts[1:]))
 
     # ====================
     def restore(self,
                 texts: Union[str, List[str]],
                 L: Optional[int] = None,
-                lambda_: Optional[int] = None) -> Union[str, List[str]]:
+                lambda_: Optional[int] = None,
+                n_jobs: Optional[int] = 1) -> Union[str, List[str]]:
         """Restore spaces to either a single string, or a list of
         strings.
 
@@ -419,6 +652,10 @@ class NBSpaceRestorer:
             The value of the hyperparameter L to set before restoring
           lambda_ (Optional[float], optional):
             The value of the hyperparameter lambda_ to set before restoring
+          n_jobs (Optional[int], optional):
+            The number of worker processes to restore a list of strings
+            with, or None to use one per CPU. Defaults to 1, in which case
+            strings are restored in the current process.
 
         Returns:
           Union[str, List[str]]:
@@ -430,16 +667,25 @@ class NBSpaceRestorer:
         if isinstance(texts, str):
             return self.restore_doc(texts)
         if isinstance(texts, list):
-            restored = []
-            texts_ = tqdm_(texts)
-            for text in texts_:
-                restored_ = self.restore_doc(text)
-                restored.append(restored_)
-                cache_size = self.restore_chunk.cache_info().currsize
-                texts_.set_postfix({
-                    'ram_usage': f"{psutil.virtual_memory().percent}%",
-                    'cache_size': f"{cache_size:,}"
-                })
+            if n_jobs is None:
+                n_jobs = os.cpu_count() or 1
+            if n_jobs == 1 or len(texts) <= 1:
+                restored = []
+                texts_ = tqdm_(texts)
+                for text in texts_:
+                    texts_.set_postfix({'doc_len': len(text)})
+                    restored_ = self.restore_doc(text)
+                    restored.append(restored_)
+                return restored
+            chunksize = max(1, len(texts) // (4 * n_jobs))
+            with ProcessPoolExecutor(n_jobs,
+                                     initializer=_init_worker,
+                                     initargs=(self,)) as pool:
+                restored = list(tqdm_(
+                    pool.map(_restore_doc_in_worker, texts,
+                             chunksize=chunksize),
+                    total=len(texts)
+                ))
             return restored
 
     # ====================
@@ -448,6 +694,7 @@ class NBSpaceRestorer:
         if L is None:
             return
         self.L = int(L)
+        self.get_log_unk()
         if self.running_grid_search is False:
             print(MESSAGE_L_SET.format(L=L))
             self.save()
@@ -458,6 +705,7 @@ class NBSpaceRestorer:
         if lambda_ is None:
             return
         self.lambda_ = float(lambda_)
+        self.get_log_unk()
         if self.running_grid_search is False:
             print(MESSAGE_LAMBDA_SET.format(lambda_=lambda_))
             self.save()
@@ -468,6 +716,7 @@ class NBSpaceRestorer:
         if unknown_function is None:
             return
         self.unknown_function = str(unknown_function)
+        self.get_log_unk()
         if self.running_grid_search is False:
             print(MESSAGE_FUNCTION_SET.format(unknown_function=unknown_function))
             self.save()
@@ -590,7 +839,6 @@ class NBSpaceRestorer:
                 'i': i, 'L': L, 'lambda': lambda_,
                 **prf, 'Time (s)': time_taken
             }
-            self.restore_chunk.cache_clear()
             self.set_L(L_start)
             self.set_lambda(lambda_start)
             self.running_grid_search = False
@@ -1,10 +1,9 @@
 from setuptools import setup
 
 REQUIREMENTS = [
-    'nltk',
+    'numba',
     'pandas',
     'tqdm',
-    'psutil',
     'sklearn',
     'fre @ git+https://github.com/ljdyer/feature-restoration-evaluator.git'
 ]
@@ -3,9 +3,13 @@
 Smoke tests to check that operations carried out in the interactive demo
 run on sample data without errors."""
 
+from collections import Counter
+from itertools import product
+from math import log10
+
 from nb_space_restorer.nb_space_restorer import NBSpaceRestorer
 import pandas as pd
-from pytest import fixture
+from pytest import fixture, warns
 
 train = pd.read_csv('sample_data/train.csv')['reference'].to_list()
 test_input = pd.read_csv('sample_data/test.csv')['input'].to_list()
@@ -86,3 +90,181 @@ def test_load(NB_TedTalks):
 def test_restore_with_loaded(NB_TedTalks):
 
     NB_TedTalks.restore(test_input)
+
+
+# ====================
+@fixture(scope='module')
+def restorer_no_letters():
+
+    restorer_ = NBSpaceRestorer(
+        train,
+        uyir_letters=[],
+        mei_letters=[],
+        ignore_case=True
+    )
+    yield restorer_
+
+
+# ====================
+def test_restore_doc_long(restorer_no_letters):
+
+    text = ''.join(train[0].lower().split()[:100])
+    restored = restorer_no_letters.restore_doc(text)
+    assert restored.replace(' ', '') == text
+
+
+# ====================
+def test_restore_doc_empty(restorer_no_letters):
+
+    assert restorer_no_letters.restore_doc('') == ''
+
+
+# ====================
+def test_restore_doc_show_chunks(restorer_no_letters):
+
+    with warns(DeprecationWarning):
+        restored = restorer_no_letters.restore_doc(test_input[0][:200],
+                                                   show_chunks=True)
+    assert restored == restorer_no_letters.restore_doc(test_input[0][:200])
+
+
+# ====================
+def test_save_and_load(restorer_no_letters, tmp_path):
+
+    restorer_no_letters.save_path = str(tmp_path / 'model.pickle')
+    restorer_no_letters.save()
+    restorer_no_letters.save_path = None
+    loaded = NBSpaceRestorer.load(str(tmp_path / 'model.pickle'),
+                                  read_only=True)
+    assert loaded.restore_doc(test_input[0]) == \
+        restorer_no_letters.restore_doc(test_input[0])
+
+
+# ====================
+def test_restore_parallel(restorer_no_letters):
+
+    texts = [test_input[0][i:i + 200] for i in range(0, 2000, 200)]
+    assert restorer_no_letters.restore(texts, n_jobs=2) == \
+        restorer_no_letters.restore(texts, n_jobs=1)
+
+
+# ====================
+def test_restore_doc_L_set_directly(restorer_no_letters):
+
+    L_start = restorer_no_letters.L
+    restorer_no_letters.L = 50
+    try:
+        restored = restorer_no_letters.restore_doc('x' * 300)
+        assert restored.replace(' ', '') == 'x' * 300
+        assert max(len(word) for word in restored.split()) <= 50
+        restorer_no_letters.running_grid_search = True
+        restorer_no_letters.set_L(50)
+        assert restorer_no_letters.restore_doc('x' * 300) == restored
+    finally:
+        restorer_no_letters.set_L(L_start)
+        restorer_no_letters.running_grid_search = False
+
+
+# ====================
+def tiny_restorer(train_texts: list, **kwargs) -> NBSpaceRestorer:
+
+    kwargs.setdefault('uyir_letters', [])
+    kwargs.setdefault('mei_letters', [])
+    return NBSpaceRestorer(train_texts, ignore_case=False, **kwargs)
+
+
+# ====================
+def test_restore_doc_expected():
+
+    restorer_ = tiny_restorer(['the cat sat on the mat'] * 3)
+    assert restorer_.restore_doc('thecatsatonthemat') == \
+        'the cat sat on the mat'
+
+
+# ====================
+def test_restore_doc_unigram():
+
+    restorer_ = tiny_restorer(['the cat sat on the mat'] * 3, max_n_gram=1)
+    assert restorer_.restore('thecatsatonthemat', lambda_=1.0) == \
+        'the cat sat on the mat'
+
+
+# ====================
+def test_restore_doc_trigram_context():
+
+    train_texts = ['p q rs'] * 3 + ['z q r s'] * 4 + ['m q r s'] * 2
+    bigram_restorer = tiny_restorer(train_texts, max_n_gram=2)
+    trigram_restorer = tiny_restorer(train_texts, max_n_gram=3)
+    # Only the trigram model sees that 'rs' follows 'p q'
+    assert bigram_restorer.restore_doc('pqrs') == 'p q r s'
+    assert trigram_restorer.restore_doc('pqrs') == 'p q rs'
+    assert trigram_restorer.restore_doc('zqrs') == 'z q r s'
+
+
+# ====================
+def test_restore_doc_uyir():
+
+    train_texts = ['cdAb cdAb cdAb Ab cd']
+    assert tiny_restorer(train_texts).restore_doc('cdAb') == 'cdAb'
+    # 'A' can only appear at the beginning of a word
+    assert tiny_restorer(train_texts, uyir_letters=['A']) \
+        .restore_doc('cdAb') == 'cd Ab'
+
+
+# ====================
+def test_restore_doc_mei():
+
+    train_texts = ['x Zy x Zy x Zy xZy']
+    assert tiny_restorer(train_texts).restore_doc('xZy') == 'x Zy'
+    # 'Z' can never appear at the beginning of a word
+    restored = tiny_restorer(train_texts, mei_letters=['Z']) \
+        .restore_doc('xZy')
+    assert restored.replace(' ', '') == 'xZy'
+    assert not any(word.startswith('Z') for word in restored.split())
+
+
+# ====================
+def bigram_scorer(train_texts: list, restorer_: NBSpaceRestorer):
+
+    unigrams = Counter(word for text in train_texts for word in text.split())
+    bigrams = Counter(bigram for text in train_texts
+                      for bigram in zip(text.split(), text.split()[1:]))
+    N1 = sum(unigrams.values())
+
+    def score(words: list) -> float:
+        total = 0.0
+        prev = None
+        for word in words:
+            if (prev, word) in bigrams:
+                total += log10(bigrams[(prev, word)] / unigrams[prev])
+            elif word in unigrams:
+                total += log10(unigrams[word] / N1)
+            else:
+                total += log10(restorer_.lambda_ / N1) - \
+                    abs(len(word) - restorer_.likely_len)
+            prev = word
+        return total
+
+    return score
+
+
+# ====================
+def test_restore_doc_brute_force():
+
+    train_texts = [text.lower() for text in train[:20]]
+    restorer_ = tiny_restorer(train_texts, max_n_gram=2)
+    restorer_.set_L(8)
+    score = bigram_scorer(train_texts, restorer_)
+    text = ''.join(''.join(train_texts).split())
+    for start in range(0, 300, 10):
+        doc = text[start:start + 10]
+        best = -float('inf')
+        for spaces in product([False, True], repeat=len(doc) - 1):
+            words = ''.join(
+                char + ' ' * space
+                for char, space in zip(doc, spaces + (False,))).split()
+            if max(map(len, words)) <= restorer_.L:
+                best = max(best, score(words))
+        restored = restorer_.restore_doc(doc)
+        assert restored.replace(' ', '') == doc
+        assert abs(score(restored.split()) - best) < 1e-9